@@ -1,104 +1,160 @@
 # backend.py
 # Author: Amil Shrivastava
 # Description: This handles the data processing and predictions.
-# It fetches data from the database, filters it by nationality, 
-# and predicts future population trends.
+# It fetches data from the database, splits it into one series per value
+# of a padró dimension (nationality by default), and predicts future population trends.
 
 import pandas as pd
+from django.db.models import Count, Max, Min, Sum
 from scripts.predict_population_trends import predict_population
-from population.models import PopulationData
+from population.models import Barri, PopulationAggregate
+from population.padro import DEFAULT_DATASET, load_dimensions
 
-def load_population_data():
+def load_areas():
     """
-    Loads population data from the Django database using the PopulationData model.
+    Loads the districts and barris stored by the load_data command.
 
     Returns:
-        pd.DataFrame: A pandas DataFrame containing the population data.
+        pd.DataFrame: One row per barri with 'code', 'name', 'district_code' and 'district_name' columns.
     """
-    data = PopulationData.objects.all().values('date', 'population_count', 'nationality')
-    df = pd.DataFrame(data)
-    df['date'] = pd.to_datetime(df['date'])  # Ensure 'date' is in datetime format
-    return df
+    data = Barri.objects.order_by('district_code', 'code').values('code', 'name', 'district_code', 'district_name')
+    return pd.DataFrame(list(data), columns=['code', 'name', 'district_code', 'district_name'])
 
-def prepare_data():
+def get_datasets():
     """
-    Prepares the data for EU, Non-EU, Local, and Unknown populations.
-    
+    Lists the padró datasets loaded in the database.
+
     Returns:
-        tuple: A tuple containing:
-            - df_eu (pd.DataFrame): EU population data.
-            - df_non_eu (pd.DataFrame): Non-EU population data.
-            - df_local (pd.DataFrame): Local population data.
-            - df_combined (pd.DataFrame): Combined population data (EU + Non-EU + Local + Unknown).
+        list: The dataset names in alphabetical order.
+    """
+    return list(PopulationAggregate.objects.values_list('dataset', flat=True).distinct().order_by('dataset'))
+
+def get_dataset_years(dataset=DEFAULT_DATASET):
     """
-    df = load_population_data()  # Load population data
+    Lists the years loaded for a dataset.
 
-    # Filter data into Local, EU, Non-EU, and Unknown categories
-    df_local = df[df['nationality'] == 'Local'].sort_values(by='date').reset_index(drop=True)
-    df_eu = df[df['nationality'] == 'EU'].sort_values(by='date').reset_index(drop=True)
-    df_non_eu = df[df['nationality'] == 'Non-EU'].sort_values(by='date').reset_index(drop=True)
-    df_unknown = df[df['nationality'] == 'Unknown'].sort_values(by='date').reset_index(drop=True)
+    Args:
+        dataset (str): Name of the padró dataset.
 
-    # Combine the Local, EU, Non-EU, and Unknown data to get the total population by date
-    df_combined = pd.concat([df_local, df_eu, df_non_eu, df_unknown]).groupby(['date']).agg({'population_count': 'sum'}).reset_index()
-    
-    return df_eu, df_non_eu, df_local, df_combined
+    Returns:
+        list: The loaded years in ascending order.
+    """
+    return list(PopulationAggregate.objects.filter(dataset=dataset).values_list('year', flat=True).distinct().order_by('year'))
 
-def get_population_predictions(df_eu, df_non_eu, df_local, df_combined, future_years):
+def get_dataset_dimensions(dataset=DEFAULT_DATASET):
     """
-    Gets population predictions for EU, Non-EU, and Combined populations.
+    Lists the dimensions of a dataset, in the order of the extract columns.
 
     Args:
-        df_eu (pd.DataFrame): EU population data.
-        df_non_eu (pd.DataFrame): Non-EU population data.
-        df_local (pd.DataFrame): Local population data.
-        df_combined (pd.DataFrame): Combined population data (EU + Non-EU + Local).
+        dataset (str): Name of the padró dataset.
 
     Returns:
-        tuple: A tuple containing:
-            - future_eu (pd.DataFrame): Predicted EU population data.
-            - future_non_eu (pd.DataFrame): Predicted Non-EU population data.
-            - future_local (pd.DataFrame): Predicted local population data.
-            - future_combined (pd.DataFrame): Predicted combined population data.
+        list: The dimension names, e.g. ['NACIONALITAT_G', 'EDAT_Q', 'SEXE'].
+    """
+    dimensions = PopulationAggregate.objects.filter(dataset=dataset).values('dimension').annotate(first_id=Min('id')).order_by('first_id')
+    return [row['dimension'] for row in dimensions]
+
+def get_data_version(dataset=DEFAULT_DATASET):
+    """
+    Returns a version string for the stored rows of a dataset. It changes whenever
+    load_data reloads a partition, so it can be used to invalidate cached results.
+
+    Args:
+        dataset (str): Name of the padró dataset.
+
+    Returns:
+        str: The data version.
+    """
+    stats = PopulationAggregate.objects.filter(dataset=dataset).aggregate(rows=Count('id'), last_id=Max('id'))
+    return f"{stats['rows']}-{stats['last_id']}"
+
+def load_population_data(dataset=DEFAULT_DATASET, dimension='NACIONALITAT_G', start_year=None, end_year=None, district_code=None, barri_code=None):
+    """
+    Loads population data from the Django database using the PopulationAggregate model.
+    The pre-summed counts are summed again in the database per date and value of the
+    requested dimension, so only one row per series and date is transferred.
+
+    Args:
+        dataset (str): Name of the padró dataset to read.
+        dimension (str): Dimension to split the population by, e.g. 'NACIONALITAT_PAIS'.
+        start_year (int): First year to read. Years are read from the first one loaded if omitted.
+        end_year (int): Last year to read. Years are read up to the last one loaded if omitted.
+        district_code (int): Restricts the data to a district.
+        barri_code (int): Restricts the data to a barri.
+
+    Returns:
+        pd.DataFrame: A pandas DataFrame with 'date', 'population_count' and 'category' columns.
     """
-    future_eu = predict_population(df_eu, years_ahead=future_years)
-    future_non_eu = predict_population(df_non_eu, years_ahead=future_years)
-    future_local = predict_population(df_local, years_ahead=future_years)
-    future_combined = predict_population(df_combined, years_ahead=future_years)
-    
-    return future_eu, future_non_eu, future_local, future_combined
+    queryset = PopulationAggregate.objects.filter(dataset=dataset, dimension=dimension)
+    if start_year is not None:
+        queryset = queryset.filter(year__gte=start_year)
+    if end_year is not None:
+        queryset = queryset.filter(year__lte=end_year)
+    if district_code is not None:
+        queryset = queryset.filter(district_code=district_code)
+    if barri_code is not None:
+        queryset = queryset.filter(barri_code=barri_code)
+
+    data = queryset.values('date', 'code').annotate(population_count=Sum('population_count'))
+    df = pd.DataFrame(list(data), columns=['date', 'code', 'population_count'])
+    df['date'] = pd.to_datetime(df['date'])  # Ensure 'date' is in datetime format
 
-def add_predictions_to_data(df_eu, df_non_eu, df_local, df_combined, future_eu, future_non_eu, future_local, future_combined):
+    # Map the dimension codes to readable labels using the dimension dictionary
+    labels = load_dimensions().get(dimension, {})
+    df['category'] = df['code'].map(lambda code: labels.get(code, str(code)))
+    return df[['date', 'population_count', 'category']]
+
+def prepare_series(dataset=DEFAULT_DATASET, dimension='NACIONALITAT_G', **filters):
     """
-    Adds the predicted population data to the historical data for smooth visualization.
+    Prepares one historical series per value of a dimension, plus their total.
 
     Args:
-        df_eu (pd.DataFrame): Historical EU population data.
-        df_non_eu (pd.DataFrame): Historical Non-EU population data.
-        df_local (pd.DataFrame): Historical local population data.
-        df_combined (pd.DataFrame): Historical combined population data.
-        future_eu (pd.DataFrame): Predicted EU population data.
-        future_non_eu (pd.DataFrame): Predicted Non-EU population data.
-        future_local (pd.DataFrame): Predicted Local population data.
-        future_combined (pd.DataFrame): Predicted combined population data.
+        dataset (str): Name of the padró dataset to read.
+        dimension (str): Dimension to split the population by.
+        **filters: Extra filters passed to load_population_data (start_year, end_year, district_code, barri_code).
 
     Returns:
         tuple: A tuple containing:
-            - df_eu_combined (pd.DataFrame): EU population data including predictions.
-            - df_non_eu_combined (pd.DataFrame): Non-EU population data including predictions.
-            - df_local_combined (pd.DataFrame): Local population data including predictions.
-            - df_combined_all (pd.DataFrame): Combined population data including predictions.
+            - series (dict): Mapping of category label to its population data (pd.DataFrame).
+            - df_combined (pd.DataFrame): Combined population data of all categories.
+    """
+    df = load_population_data(dataset, dimension, **filters)
+
+    series = {
+        category: group[['date', 'population_count']].sort_values(by='date').reset_index(drop=True)
+        for category, group in df.groupby('category')
+    }
+
+    # Combine all categories to get the total population by date
+    df_combined = df.groupby(['date']).agg({'population_count': 'sum'}).reset_index()
+
+    return series, df_combined
+
+def get_series_predictions(series, future_years):
+    """
+    Gets population predictions for every series.
+
+    Args:
+        series (dict): Mapping of label to historical population data.
+        future_years (int): Number of years ahead to predict.
+
+    Returns:
+        dict: Mapping of label to predicted population data.
     """
-    last_row = df_eu.iloc[[-1]][['date', 'population_count']]
-    df_eu_combined = pd.concat([last_row, future_eu])
+    return {label: predict_population(df, years_ahead=future_years) for label, df in series.items()}
 
-    last_row = df_non_eu.iloc[[-1]][['date', 'population_count']]
-    df_non_eu_combined = pd.concat([last_row, future_non_eu])
-    
-    last_row = df_local.iloc[[-1]][['date', 'population_count']]
-    df_local_combined = pd.concat([last_row, future_local])
+def add_series_predictions(series, future):
+    """
+    Prepends the last historical point of every series to its predictions for smooth visualization.
 
-    last_row = df_combined.iloc[[-1]][['date', 'population_count']]
-    df_combined_all = pd.concat([last_row, future_combined])
+    Args:
+        series (dict): Mapping of label to historical population data.
+        future (dict): Mapping of label to predicted population data.
 
-    return df_eu_combined, df_non_eu_combined, df_local_combined, df_combined_all
+    Returns:
+        dict: Mapping of label to population data including predictions.
+    """
+    return {
+        label: pd.concat([df.iloc[[-1]][['date', 'population_count']], future[label]])
+        for label, df in series.items()
+    }
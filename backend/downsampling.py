@@ -0,0 +1,74 @@
+# downsampling.py
+# Author: Amil Shrivastava
+# Description: This reduces long time series to roughly the resolution of the chart they are drawn in,
+# using the largest-triangle-three-buckets (LTTB) algorithm, so the data sent to the plots and the
+# time needed to render them depend on the chart width instead of on the number of stored dates.
+
+import numpy as np
+import pandas as pd
+
+def lttb_indices(x, y, threshold):
+    """
+    Selects the points to keep with the largest-triangle-three-buckets algorithm.
+
+    The first and last points are always kept. The points in between are split into
+    threshold - 2 buckets and, in each bucket, the point forming the largest triangle with
+    the previously kept point and the average of the next bucket is kept.
+
+    Args:
+        x (np.ndarray): Increasing x values.
+        y (np.ndarray): y values.
+        threshold (int): Number of points to keep.
+
+    Returns:
+        np.ndarray: Indices of the kept points, in increasing order.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # Bucket edges over the points between the first and the last one
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    indices = np.empty(threshold, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # Average of the next bucket (the last point for the final bucket)
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(areas.argmax())
+        indices[bucket + 1] = previous
+
+    return indices
+
+def downsample_series(df, width_px, points_per_px=1):
+    """
+    Reduces a population series to about one point per horizontal pixel of the chart.
+
+    Args:
+        df (pd.DataFrame): Series with 'date' and 'population_count' columns, sorted by date.
+        width_px (int): Width of the plotting area in pixels.
+        points_per_px (float): Number of points to keep per pixel.
+
+    Returns:
+        pd.DataFrame: The downsampled series. Series that already fit are returned unchanged.
+    """
+    threshold = max(int(width_px * points_per_px), 3)
+    if len(df) <= threshold:
+        return df
+
+    x = pd.to_datetime(df['date']).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    indices = lttb_indices(x, df['population_count'].to_numpy(), threshold)
+    return df.iloc[indices].reset_index(drop=True)
@@ -7,10 +7,14 @@ import streamlit as st
 import sys
 import os
 import django
-from frontend import plot_population_trends_with_predictions
+from frontend import plot_population_trends_with_predictions, CHART_WIDTH_PX
 
 # Constants
-FUTURE_YEARS = 3
+DEFAULT_FUTURE_YEARS = 3
+MAX_FUTURE_YEARS = 10
+TOTAL_LABEL = 'Total'
+MAX_DEFAULT_SERIES = 10
+DATA_VERSION_TTL = 60  # Seconds before checking whether the data has been reloaded
 
 # Add the root directory of your Django project to the Python path
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # Adjust '..' based on app.py's location
@@ -20,23 +24,167 @@ sys.path.append(project_root)
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'population_growth_project.settings')  # Replace with your project's settings
 django.setup()
 
-from backend.backend import prepare_data, get_population_predictions, add_predictions_to_data
+from backend.backend import get_datasets, get_data_version, load_areas, get_dataset_years, get_dataset_dimensions, prepare_series, add_series_predictions
+from population.padro import DEFAULT_DATASET, load_dimensions
+from backend.downsampling import downsample_series
+from scripts.predict_population_trends import fit_population_model, predict_from_model
 
-def prepare_data_opt():
+# Every widget change re-runs this script, so each step below is cached on exactly the
+# controls it depends on: changing one control only recomputes the series it affects.
+# A series is identified by its key: (dataset, data version, dimension, district_code, barri_code).
+# The data version is part of the key so that reloading the database invalidates the cached series.
+
+@st.cache_data(ttl=DATA_VERSION_TTL)
+def fetch_datasets():
+    """
+    Fetches the loaded padró datasets, rechecked every DATA_VERSION_TTL seconds.
+
+    Returns:
+        list: The dataset names.
     """
-    Prepares data before running the app to optimize speed 
+    return get_datasets()
+
+@st.cache_data(ttl=DATA_VERSION_TTL)
+def fetch_data_version(dataset):
     """
-    # Prepare data
-    df_eu, df_non_eu, df_local, df_combined = prepare_data()
+    Fetches the version of the stored data, rechecked every DATA_VERSION_TTL seconds.
 
-    # Get predictions
-    future_eu, future_non_eu, future_local, future_combined = get_population_predictions(df_eu, df_non_eu, df_local, df_combined, future_years=FUTURE_YEARS)
+    Args:
+        dataset (str): Name of the padró dataset.
 
-    # Add predictions to the historical data for plotting
-    df_eu_combined, df_non_eu_combined, df_local_combined, df_combined_all = add_predictions_to_data(df_eu, df_non_eu, df_local, df_combined, future_eu, future_non_eu, future_local, future_combined)
-    
-    return df_eu, df_non_eu, df_local, df_combined, df_eu_combined, df_non_eu_combined, df_local_combined, df_combined_all, future_eu, future_non_eu, future_local, future_combined 
-    
+    Returns:
+        str: The data version.
+    """
+    return get_data_version(dataset)
+
+@st.cache_data
+def fetch_filter_options(dataset, data_version):
+    """
+    Fetches the values offered by the sidebar controls.
+
+    Args:
+        dataset (str): Name of the padró dataset.
+        data_version (str): Version of the stored data, so a new load refreshes the options.
+
+    Returns:
+        tuple: (loaded years, nationality dimensions of the dataset, areas DataFrame).
+    """
+    dimensions = [name for name in get_dataset_dimensions(dataset) if name.startswith(('NACIONALITAT', 'LLOC_NAIX'))]
+    return get_dataset_years(dataset), dimensions, load_areas()
+
+@st.cache_resource(max_entries=64)
+def fetch_series(series_key):
+    """
+    Fetches the historical series of one dimension for one area, plus their total.
+    Cached as a shared resource so reruns do not copy hundreds of series; callers must not modify it.
+
+    Args:
+        series_key (tuple): (dataset, data version, dimension, district_code, barri_code), where
+            None area codes select the whole city or district.
+
+    Returns:
+        dict: Mapping of label to historical population data.
+    """
+    dataset, _, dimension, district_code, barri_code = series_key
+    series, df_combined = prepare_series(dataset, dimension, district_code=district_code, barri_code=barri_code)
+    series[TOTAL_LABEL] = df_combined
+    return series
+
+@st.cache_resource(max_entries=4096)
+def get_history(series_key, label, start_year, end_year):
+    """
+    Returns the historical data of one series restricted to the selected years.
+    Shared between the forecasting and plotting steps; callers must not modify it.
+
+    Args:
+        series_key (tuple): Identifies the series group, as in fetch_series.
+        label (str): Label of the series within the group.
+        start_year (int): First year to keep.
+        end_year (int): Last year to keep.
+
+    Returns:
+        pd.DataFrame: The historical population data of the series.
+    """
+    df = fetch_series(series_key)[label]
+    years = df['date'].dt.year
+    return df[(years >= start_year) & (years <= end_year)].reset_index(drop=True)
+
+@st.cache_resource(max_entries=1024)
+def fit_series(series_key, label, start_year, end_year):
+    """
+    Fits the forecasting model of one series on its history in the selected years. Kept apart
+    from forecast_series so that changing the horizon reuses the fitted model.
+
+    Args:
+        series_key, label, start_year, end_year: Identify the history, as in get_history.
+
+    Returns:
+        tuple: (model, last year) as returned by fit_population_model, or None when there is no history to fit.
+    """
+    df = get_history(series_key, label, start_year, end_year)
+    if df.empty:
+        return None
+    return fit_population_model(df.copy())
+
+@st.cache_data
+def forecast_series(series_key, label, start_year, end_year, future_years):
+    """
+    Predicts one series from its history in the selected years. Cached per series, so
+    selecting another nationality or area only forecasts the series that were not shown before.
+
+    Args:
+        series_key, label, start_year, end_year: Identify the history, as in get_history.
+        future_years (int): Number of years ahead to predict.
+
+    Returns:
+        pd.DataFrame: Predicted population data starting at the last historical point, or None
+            when there is no history to fit.
+    """
+    fitted = fit_series(series_key, label, start_year, end_year)
+    if fitted is None:
+        return None
+    df = get_history(series_key, label, start_year, end_year)
+    future = predict_from_model(*fitted, years_ahead=future_years)
+    return add_series_predictions({label: df}, {label: future})[label]
+
+@st.cache_data(max_entries=1024)
+def fetch_plot_history(series_key, label, start_year, end_year, width_px):
+    """
+    Returns the history of one series downsampled to the chart resolution. Cached per data
+    version and viewport (date range and chart width), so the amount of data handed to the
+    plot depends on the chart width rather than on the number of stored dates.
+
+    Args:
+        series_key, label, start_year, end_year: Identify the history, as in get_history.
+        width_px (int): Width of the chart in pixels.
+
+    Returns:
+        pd.DataFrame: The downsampled historical population data.
+    """
+    return downsample_series(get_history(series_key, label, start_year, end_year), width_px)
+
+def select_area(areas):
+    """
+    Renders the district and barri controls.
+
+    Args:
+        areas (pd.DataFrame): Districts and barris loaded from the database.
+
+    Returns:
+        tuple: (district_code, barri_code, area name), with None codes for "All".
+    """
+    districts = areas.drop_duplicates('district_code')
+    district_names = dict(zip(districts['district_code'], districts['district_name']))
+    district_code = st.sidebar.selectbox('District', [None] + list(district_names), format_func=lambda code: 'All' if code is None else district_names[code])
+    if district_code is None:
+        return None, None, 'Barcelona City'
+
+    barris = areas[areas['district_code'] == district_code]
+    barri_names = dict(zip(barris['code'], barris['name']))
+    barri_code = st.sidebar.selectbox('Barri', [None] + list(barri_names), format_func=lambda code: 'All' if code is None else barri_names[code])
+    if barri_code is None:
+        return district_code, None, district_names[district_code]
+    return district_code, barri_code, barri_names[barri_code]
 
 def main():
     """
@@ -44,7 +192,45 @@ def main():
     and plots the population trends with predictions.
     """
     
-    df_eu, df_non_eu, df_local, df_combined, df_eu_combined, df_non_eu_combined, df_local_combined, df_combined_all, future_eu, future_non_eu, future_local, future_combined  = prepare_data_opt()
+    datasets = fetch_datasets()
+    if not datasets:
+        st.error('No population data has been loaded yet.')
+        return
+
+    # Controls
+    st.sidebar.header('Filters')
+    default_dataset = datasets.index(DEFAULT_DATASET) if DEFAULT_DATASET in datasets else 0
+    dataset = st.sidebar.selectbox('Dataset', datasets, index=default_dataset)
+    data_version = fetch_data_version(dataset)
+    years, dimensions, areas = fetch_filter_options(dataset, data_version)
+    if not dimensions:
+        st.warning(f"The '{dataset}' dataset has no nationality or birthplace breakdown to plot. Please choose another dataset.")
+        return
+
+    future_years = st.sidebar.slider('Forecast horizon (years)', 1, MAX_FUTURE_YEARS, DEFAULT_FUTURE_YEARS)
+    start_year, end_year = st.sidebar.slider('Date range', years[0], years[-1], (years[0], years[-1])) if len(years) > 1 else (years[0], years[0])
+    labels = load_dimensions()
+    dimension = st.sidebar.selectbox('Nationality breakdown', dimensions, format_func=lambda name: name.replace('_', ' ').title())
+    district_code, barri_code, area_name = select_area(areas)
+
+    series_key = (dataset, data_version, dimension, district_code, barri_code)
+    series = fetch_series(series_key)
+    categories = [label for label in series if label != TOTAL_LABEL]
+    if len(categories) > MAX_DEFAULT_SERIES:
+        # Default to the largest categories when the breakdown is too wide to plot at once
+        latest = {label: series[label]['population_count'].iloc[-1] for label in categories}
+        default = sorted(categories, key=latest.get, reverse=True)[:MAX_DEFAULT_SERIES // 2]
+    else:
+        default = [label for label in labels.get(dimension, {}).values() if label in categories]
+    selected = st.sidebar.multiselect('Nationality', categories + [TOTAL_LABEL], default=default + [TOTAL_LABEL])
+
+    history = {}
+    predictions = {}
+    for label in selected:
+        history[label] = fetch_plot_history(series_key, label, start_year, end_year, CHART_WIDTH_PX)
+        future = forecast_series(series_key, label, start_year, end_year, future_years)
+        if future is not None:
+            predictions[label] = future
 
     # Plot data
     st.header('Population Trends with Predictions')
@@ -63,10 +249,10 @@ def main():
     - Visualizing trends and insights through an interactive Streamlit dashboard.
 
     Additionally, the project incorporates a linear regression machine learning model to forecast population trends in Barcelona
-    for the next three years, providing actionable insights based on historical data.
+    for the selected number of years, providing actionable insights based on historical data.
     """
 )
-    plot_population_trends_with_predictions(df_eu, df_non_eu, df_local, df_combined, df_eu_combined, df_non_eu_combined, df_local_combined, df_combined_all)
+    plot_population_trends_with_predictions(history, predictions, title=f'{area_name} Population Trends with Predictions')
     
 # Run the app
 if __name__ == "__main__":
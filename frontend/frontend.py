@@ -2,63 +2,101 @@
 # Author: Amil Shrivastava
 # Description: This is responsible for the Streamlit front-end. 
 # It renders the plots, handles the UI, and displays data.
+# Charts are Vega-Lite specs drawn by the browser, so a rerun only sends the
+# chart data instead of rendering an image on the server.
 
+import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
-import seaborn as sns
-import matplotlib.ticker as ticker
 
-# Custom Y-axis formatter
-def format_y_axis(value, pos):
+# Size of the chart in pixels
+CHART_WIDTH_PX = 1000
+CHART_HEIGHT_PX = 600
+
+# Markers are only drawn on series short enough for them to stay readable
+MAX_POINTS_WITH_MARKERS = 60
+
+# Custom Y-axis format for large numbers (e.g. 1700k), as a Vega expression
+Y_AXIS_LABEL_EXPR = "datum.value >= 1000 ? format(datum.value / 1000, '.0f') + 'k' : format(datum.value, '.0f')"
+
+def to_long_format(series):
     """
-    Custom formatter for large numbers on the y-axis.
+    Stacks a mapping of series into a single DataFrame for the chart.
 
     Args:
-        value (float): The y-axis value.
-        pos (int): The tick position.
+        series (dict): Mapping of label to population data (pd.DataFrame).
 
     Returns:
-        str: The formatted value.
+        pd.DataFrame: 'date', 'population_count' and 'series' columns.
     """
-    if value >= 1000:
-        return f'{value/1000:.0f}k'
-    return f'{value:.0f}'
+    frames = [df[['date', 'population_count']].assign(series=label) for label, df in series.items()]
+    if not frames:
+        return pd.DataFrame(columns=['date', 'population_count', 'series'])
+    return pd.concat(frames, ignore_index=True)
 
-def plot_population_trends_with_predictions(df_eu, df_non_eu, df_local, df_combined, future_eu, future_non_eu, future_local, future_combined):
+def population_chart_spec(title, series_count, show_markers):
     """
-    Plots the historical and predicted population trends.
+    Builds the Vega-Lite spec of the population chart. The spec is written as a plain
+    dictionary so that no chart library has to build and validate it on every rerun.
 
     Args:
-        df_eu (pd.DataFrame): Historical EU population data.
-        df_non_eu (pd.DataFrame): Historical Non-EU population data.
-        df_local (pd.DataFrame): Historical local population data.
-        df_combined (pd.DataFrame): Historical combined population data.
-        future_eu (pd.DataFrame): Predicted EU population data.
-        future_non_eu (pd.DataFrame): Predicted Non-EU population data.
-        future_local (pd.DataFrame): Predicted local population data.
-        future_combined (pd.DataFrame): Predicted combined population data.
+        title (str): Title of the chart.
+        series_count (int): Number of historical series, used to pick the colour scheme.
+        show_markers (bool): Whether to draw markers on the historical lines.
+
+    Returns:
+        dict: The Vega-Lite spec, reading the 'history' and 'predictions' datasets.
     """
-    fig, ax = plt.subplots(figsize=(10, 6))
+    x = {'field': 'date', 'type': 'temporal', 'title': 'Year'}
+    y = {'field': 'population_count', 'type': 'quantitative', 'title': 'Population Count', 'axis': {'labelExpr': Y_AXIS_LABEL_EXPR}}
+    tooltip = [
+        {'field': 'series', 'type': 'nominal'},
+        {'field': 'date', 'type': 'temporal', 'format': '%Y'},
+        {'field': 'population_count', 'type': 'quantitative', 'format': ',.0f'},
+    ]
+    return {
+        'title': title,
+        'width': CHART_WIDTH_PX,
+        'height': CHART_HEIGHT_PX,
+        'layer': [
+            # Historical data, one colour per series
+            {
+                'data': {'name': 'history'},
+                'mark': {'type': 'line', 'point': show_markers},
+                'encoding': {
+                    'x': x,
+                    'y': y,
+                    'color': {'field': 'series', 'type': 'nominal', 'title': 'Historical',
+                              'scale': {'scheme': 'tableau10' if series_count <= 10 else 'category20'}},
+                    'tooltip': tooltip,
+                },
+            },
+            # Predicted data as dotted black lines
+            {
+                'data': {'name': 'predictions'},
+                'mark': {'type': 'line', 'point': True, 'color': 'black', 'strokeDash': [2, 3]},
+                'encoding': {'x': x, 'y': y, 'detail': {'field': 'series', 'type': 'nominal'}, 'tooltip': tooltip},
+            },
+        ],
+    }
 
-    # Plot the historical and predicted data
-    sns.lineplot(data=df_eu, x='date', y='population_count', ax=ax, label='EU Population (Historical)', color='blue', linestyle='solid', marker='o', markersize=4) 
-    sns.lineplot(data=future_eu, x='date', y='population_count', ax=ax, color='black', linestyle='dotted', marker='o', markersize=4) 
-    
-    sns.lineplot(data=df_non_eu, x='date', y='population_count', ax=ax, label='Non-EU Population (Historical)', color='red', linestyle='solid', marker='o', markersize=4)
-    sns.lineplot(data=future_non_eu, x='date', y='population_count', ax=ax, color='black', linestyle='dotted', marker='o', markersize=4)
-    
-    sns.lineplot(data=df_local, x='date', y='population_count', ax=ax, label='Local Population (Historical)', color='Yellow', linestyle='solid', marker='o', markersize=4)
-    sns.lineplot(data=future_local, x='date', y='population_count', ax=ax, color='black', linestyle='dotted', marker='o', markersize=4)
-    
-    sns.lineplot(data=df_combined, x='date', y='population_count', ax=ax, label='Total Population (Historical)', color='green', linestyle='solid', marker='o', markersize=4)
-    sns.lineplot(data=future_combined, x='date', y='population_count', ax=ax, label='Predicted Population', color='black', linestyle='dotted', marker='o', markersize=4)
+def plot_population_trends_with_predictions(series, series_with_predictions, title='Barcelona City Population Trends with Predictions'):
+    """
+    Plots the historical and predicted population trends.
 
-    # Format y-axis
-    ax.yaxis.set_major_formatter(ticker.FuncFormatter(format_y_axis))
+    Long series should be downsampled to about CHART_WIDTH_PX points beforehand, see
+    backend.downsampling.downsample_series.
 
-    ax.set_title('Barcelona City Population Trends (EU, Non-EU, Local and Total) with Predictions')
-    ax.set_xlabel('Year')
-    ax.set_ylabel('Population Count')
-    plt.xticks(rotation=45) 
-    ax.legend()
-    st.pyplot(fig)
+    Args:
+        series (dict): Mapping of label to historical population data (pd.DataFrame).
+        series_with_predictions (dict): Mapping of label to predicted population data,
+            starting at the last historical point.
+        title (str): Title of the chart.
+    """
+    show_markers = all(len(df) <= MAX_POINTS_WITH_MARKERS for df in series.values())
+    spec = population_chart_spec(title, len(series), show_markers)
+    spec['datasets'] = {
+        'history': to_long_format(series),
+        'predictions': to_long_format(series_with_predictions),
+    }
+    # Streamlit stretches charts to the container by default, which would override the spec width
+    st.vega_lite_chart(spec, width=CHART_WIDTH_PX)
@@ -0,0 +1,89 @@
+# ingest_worker.py
+# Author: Amil Shrivastava
+# Description: Worker side of the ingest command. Raw padró files are parsed here in separate
+# processes and sent to the writer in batches. This module must not import Django: with the
+# 'spawn' and 'forkserver' start methods each worker re-imports it before Django is set up.
+
+import json
+import queue
+import pandas as pd
+from population.padro import load_dimensions, clean_padro_frame, aggregate_dimensions, extract_areas
+
+# PopulationData fields in the order the workers encode each row
+ROW_FIELDS = ['dataset', 'year', 'date', 'district_code', 'barri_code', 'population_count', 'dimensions']
+
+# PopulationAggregate fields in the order the workers encode each aggregate
+AGGREGATE_FIELDS = ['dataset', 'year', 'date', 'district_code', 'barri_code', 'dimension', 'code', 'population_count']
+
+def put_batch(batch_queue, stop_event, message):
+    """
+    Puts a message on the bounded queue, giving up if the writer asks the workers to stop.
+
+    Args:
+        batch_queue (Queue): Bounded queue shared with the writer.
+        stop_event (Event): Set by the writer when it stops consuming the queue.
+        message (tuple): The message to send.
+
+    Returns:
+        bool: True if the message was queued, False if the worker must stop.
+    """
+    while not stop_event.is_set():
+        try:
+            batch_queue.put(message, timeout=1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def parse_raw_file(file_path, dataset, year, batch_queue, stop_event, batch_size):
+    """
+    Parses one raw padró file in a worker process and sends its rows to the writer in batches.
+
+    Messages put on the queue, in order:
+    - ('areas', records): the districts and barris named in the file
+    - ('partition', dataset, year): the partition the following batches belong to
+    - ('rows', rows): a batch of rows already encoded as database values, in ROW_FIELDS order
+    - ('aggregates', rows): a batch of the partition aggregates, in AGGREGATE_FIELDS order
+    - ('done', file_path, row_count) or ('error', file_path, message) once the file is finished
+
+    The queue is bounded, so a worker waits while the writer is behind instead of piling batches up in memory.
+    Batches are encoded one at a time for the same reason, and the worker returns early once the writer
+    sets the stop event.
+
+    Args:
+        file_path (str): Path to the raw CSV file.
+        dataset (str): Name of the padró dataset of the file.
+        year (int): Year of the file.
+        batch_queue (Queue): Bounded queue shared with the writer.
+        stop_event (Event): Set by the writer when it stops consuming the queue.
+        batch_size (int): Number of rows per batch.
+    """
+    try:
+        df = pd.read_csv(file_path)
+        cleaned, dims = clean_padro_frame(df, load_dimensions())
+        areas = extract_areas(df).to_dict(orient='records')
+    except Exception as e:
+        put_batch(batch_queue, stop_event, ('error', file_path, str(e)))
+        return
+    # Only the cleaned rows are needed from here on
+    del df
+
+    if not (put_batch(batch_queue, stop_event, ('areas', areas))
+            and put_batch(batch_queue, stop_event, ('partition', dataset, year))):
+        return
+
+    # Encoding the rows here, including the dimensions JSON, leaves only the inserts to the writer
+    for start in range(0, len(cleaned), batch_size):
+        rows = [
+            (dataset, year, date, district_code, barri_code, value, json.dumps(dict(zip(dims, codes))))
+            for date, district_code, barri_code, value, *codes in cleaned.iloc[start:start + batch_size].itertuples(index=False, name=None)
+        ]
+        if not put_batch(batch_queue, stop_event, ('rows', rows)):
+            return
+
+    aggregates = aggregate_dimensions(cleaned, dims)
+    for start in range(0, len(aggregates), batch_size):
+        rows = [(dataset, year, *row) for row in aggregates.iloc[start:start + batch_size].itertuples(index=False, name=None)]
+        if not put_batch(batch_queue, stop_event, ('aggregates', rows)):
+            return
+    put_batch(batch_queue, stop_event, ('done', file_path, len(cleaned)))
@@ -0,0 +1,194 @@
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from population.ingest_worker import ROW_FIELDS, AGGREGATE_FIELDS, parse_raw_file
+from population.models import Barri, PopulationAggregate, PopulationData
+from population.padro import list_raw_files
+
+class Command(BaseCommand):
+    """
+    Django management command to ingest raw padró files straight into the database.
+
+    Raw yearly files are parsed concurrently in worker processes, which send their rows in
+    batches through a bounded queue to a single writer (this process) that inserts them. Parsing
+    and writing overlap, and the bounded queue keeps memory flat when the database is the slower
+    side. Each (dataset, year) partition found in the files replaces the stored one, and the whole
+    ingest is committed at once: if any file fails or the writer raises, the run is rolled back,
+    leaving the previous data in place, and the command exits with an error.
+
+    Attributes:
+        help (str): Short description of the command.
+    """
+
+    help = 'Ingest all raw padró CSV files in a folder directly into the database'
+
+    def add_arguments(self, parser):
+        """
+        Adds arguments to the command line parser.
+
+        Args:
+            parser (ArgumentParser): Argument parser for adding custom command line arguments.
+        """
+        parser.add_argument(
+            'input_folder',
+            type=str,
+            help="Folder containing the raw '<year>_pad_mdb_<dataset>.csv' or '<year>_pad_mdbas_<dataset>.csv' files."
+        )
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of parsing processes.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Number of rows per batch sent to the writer.')
+        parser.add_argument('--queue-size', type=int, default=8, help='Maximum number of batches waiting for the writer.')
+
+    def handle(self, *args, **kwargs):
+        """
+        Handles the main logic of the command. Starts one parsing task per raw file and writes
+        the batches they produce as they arrive.
+
+        Args:
+            *args: Additional positional arguments (unused).
+            **kwargs: Keyword arguments, including the input folder and tuning options.
+        """
+        input_folder = kwargs['input_folder']
+
+        # Check if the input folder exists
+        if not os.path.exists(input_folder):
+            self.stdout.write(self.style.ERROR(f"The folder '{input_folder}' does not exist."))
+            return
+
+        files = list_raw_files(input_folder)
+        if not files:
+            self.stdout.write(self.style.WARNING(f"No padró files found in '{input_folder}'."))
+            return
+
+        workers = max(1, min(kwargs['workers'] or 1, len(files)))
+        with Manager() as manager, ProcessPoolExecutor(max_workers=workers) as executor:
+            batch_queue = manager.Queue(maxsize=kwargs['queue_size'])
+            stop_event = manager.Event()
+            futures = [
+                executor.submit(parse_raw_file, file_path, dataset, year, batch_queue, stop_event, kwargs['batch_size'])
+                for file_path, year, dataset in files
+            ]
+            try:
+                with transaction.atomic():
+                    row_count, errors = self.write_batches(batch_queue, futures)
+                    if errors:
+                        for file_path, message in errors:
+                            self.stdout.write(self.style.ERROR(f"Error processing '{file_path}': {message}"))
+                        # Raising inside the atomic block rolls back the files that were written
+                        raise CommandError(f'{len(errors)} of {len(files)} files failed; nothing was ingested.')
+            except BaseException:
+                # Workers blocked on the full queue would otherwise keep the executor from shutting down
+                stop_event.set()
+                self.drain_queue(batch_queue, futures)
+                executor.shutdown(cancel_futures=True)
+                raise
+
+        self.stdout.write(self.style.SUCCESS(f'Ingested {row_count} rows from {len(files)} files.'))
+
+    def write_batches(self, batch_queue, futures):
+        """
+        Consumes the queue until every parsing task has finished, inserting the batches it receives.
+        Batches are inserted with a single executemany each, skipping the per-object work of the ORM.
+
+        Args:
+            batch_queue (Queue): Queue filled by the parsing tasks.
+            futures (list): Futures of the parsing tasks.
+
+        Returns:
+            tuple: (number of inserted rows, list of (file path, error message) for the failed files).
+        """
+        pending = len(futures)
+        row_count = 0
+        errors = []
+        failed_futures = set()
+        areas = {}
+
+        insert_sql = self.insert_sql(PopulationData, ROW_FIELDS)
+        insert_aggregate_sql = self.insert_sql(PopulationAggregate, AGGREGATE_FIELDS)
+
+        while pending:
+            try:
+                message = batch_queue.get(timeout=1)
+            except queue.Empty:
+                # A worker that died before reporting would otherwise keep the writer waiting
+                for future in futures:
+                    if future.done() and future.exception() is not None and future not in failed_futures:
+                        failed_futures.add(future)
+                        errors.append(('<worker>', str(future.exception())))
+                        pending -= 1
+                continue
+
+            kind = message[0]
+            if kind == 'areas':
+                for area in message[1]:
+                    areas[area['Codi_Barri']] = area
+            elif kind == 'partition':
+                _, dataset, year = message
+                # Drop the previous load of this partition so ingesting is idempotent
+                PopulationData.objects.filter(dataset=dataset, year=year).delete()
+                PopulationAggregate.objects.filter(dataset=dataset, year=year).delete()
+            elif kind == 'rows':
+                rows = message[1]
+                with connection.cursor() as cursor:
+                    cursor.executemany(insert_sql, rows)
+                row_count += len(rows)
+            elif kind == 'aggregates':
+                with connection.cursor() as cursor:
+                    cursor.executemany(insert_aggregate_sql, message[1])
+            elif kind == 'done':
+                pending -= 1
+            elif kind == 'error':
+                errors.append((message[1], message[2]))
+                pending -= 1
+
+        if areas:
+            Barri.objects.all().delete()
+            Barri.objects.bulk_create([
+                Barri(
+                    code=int(area['Codi_Barri']),
+                    name=area['Nom_Barri'],
+                    district_code=int(area['Codi_Districte']),
+                    district_name=area['Nom_Districte'],
+                )
+                for area in sorted(areas.values(), key=lambda area: area['Codi_Barri'])
+            ])
+
+        return row_count, errors
+
+    def drain_queue(self, batch_queue, futures):
+        """
+        Discards the queued batches until every parsing task has stopped, so no worker stays blocked on the queue.
+
+        Args:
+            batch_queue (Queue): Queue filled by the parsing tasks.
+            futures (list): Futures of the parsing tasks.
+        """
+        for future in futures:
+            future.cancel()
+        while not all(future.done() for future in futures):
+            try:
+                batch_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        while True:
+            try:
+                batch_queue.get_nowait()
+            except queue.Empty:
+                break
+
+    def insert_sql(self, model, fields):
+        """
+        Builds the INSERT statement used to write pre-encoded rows of a model.
+
+        Args:
+            model (Model): The model to insert into.
+            fields (list): Field names, in the order of the encoded values.
+
+        Returns:
+            str: The INSERT statement with one placeholder per field.
+        """
+        quote_name = connection.ops.quote_name
+        columns = ', '.join(quote_name(model._meta.get_field(name).column) for name in fields)
+        return f"INSERT INTO {quote_name(model._meta.db_table)} ({columns}) VALUES ({', '.join(['%s'] * len(fields))})"
@@ -1,14 +1,18 @@
 import csv
 import os
+import pandas as pd
 from django.core.management.base import BaseCommand
-from population.models import PopulationData
+from django.db import transaction
+from population.models import Barri, PopulationAggregate, PopulationData
+from population.padro import DATE_COLUMN, VALUE_COLUMN, aggregate_dimensions
 
 class Command(BaseCommand):
     """
-    Django management command to load population data into the database from CSV files.
+    Django management command to load population data into the database from cleaned CSV files.
     
-    This command reads all CSV files in a specified folder, processes each row, 
-    and inserts the data into the PopulationData model in batches for efficiency.
+    The input folder is laid out as written by data_processing.py: one '<dataset>/<year>.csv'
+    file per partition plus an 'areas.csv' file with the district and barri names. Each file
+    replaces its (dataset, year) partition and is inserted in batches for efficiency.
     
     Attributes:
         help (str): Short description of the command.
@@ -33,9 +37,8 @@ class Command(BaseCommand):
 
     def handle(self, *args, **kwargs):
         """
-        Handles the main logic of the command. Iterates through all CSV files in the specified 
-        input folder, processes them row by row, and inserts data into the PopulationData model 
-        in batches for efficiency.
+        Handles the main logic of the command. Loads the area names, then iterates through
+        every dataset folder and replaces the (dataset, year) partition of each CSV file.
         
         Args:
             *args: Additional positional arguments (unused).
@@ -43,63 +46,150 @@ class Command(BaseCommand):
         """
         # Get the input folder from the command arguments
         input_folder = kwargs['input_folder']
-        batch_size = 1000  # The batch size to control memory usage when inserting records
 
         # Check if the input folder exists
         if not os.path.exists(input_folder):
             self.stdout.write(self.style.ERROR(f"The folder '{input_folder}' does not exist."))
             return
 
-        # Iterate through all CSV files in the input folder
-        for file_name in os.listdir(input_folder):
-            if file_name.endswith('.csv'):
-                file_path = os.path.join(input_folder, file_name)
-                ## Debugging
-                # self.stdout.write(self.style.NOTICE(f'Loading {file_name}'))
-
-                # List to accumulate records to insert into the database
-                records_to_create = []
-
-                # Open the CSV file for reading
-                with open(file_path, 'r') as file:
-                    reader = csv.DictReader(file)
-
-                    # Process each row in the CSV
-                    for row in reader:
-                        try:
-                            # Ensure the required fields are present and valid
-                            if not row['Valor'] or not row['Data_Referencia']:
-                                ## Debugging
-                                # self.stdout.write(self.style.WARNING(f'Skipping row with missing data: {row}'))
-                                continue
-
-                            ## Debug log: Check the content of the current row
-                            # self.stdout.write(self.style.NOTICE(f"Processing row: {row}"))
-
-                            # Append the row as a new PopulationData object
-                            records_to_create.append(PopulationData(
-                                date=row['Data_Referencia'],
-                                population_count=row['Valor'],  # Map 'Valor' from the CSV to the model's field
-                                nationality=row['NACIONALITAT_G'],
-                            ))
-
-                            # Insert records in batches to optimize memory usage
-                            if len(records_to_create) >= batch_size:
-                                PopulationData.objects.bulk_create(records_to_create)
-                                records_to_create = []  # Reset the list after insertion
-
-                        except KeyError as e:
-                            # Handle case where a column is missing in the current row
-                            self.stdout.write(self.style.ERROR(f"Missing column in row: {e}. Row: {row}"))
-                        except Exception as e:
-                            # Handle any other errors
-                            self.stdout.write(self.style.ERROR(f"Error processing row: {e}. Row: {row}"))
-
-                # Insert any remaining records after processing the file
-                if records_to_create:
-                    PopulationData.objects.bulk_create(records_to_create)
+        areas_path = os.path.join(input_folder, 'areas.csv')
+        if os.path.exists(areas_path):
+            self.load_areas(areas_path)
+
+        # Iterate through all dataset folders and their yearly CSV files
+        for dataset in sorted(os.listdir(input_folder)):
+            dataset_folder = os.path.join(input_folder, dataset)
+            if not os.path.isdir(dataset_folder):
+                continue
+
+            for file_name in sorted(os.listdir(dataset_folder)):
+                year = os.path.splitext(file_name)[0]
+                if not file_name.endswith('.csv') or not year.isdigit():
+                    continue
                 ## Debugging
-                # self.stdout.write(self.style.SUCCESS(f'Successfully loaded data from {file_name}'))
+                # self.stdout.write(self.style.NOTICE(f'Loading {dataset}/{file_name}'))
+                self.load_partition(os.path.join(dataset_folder, file_name), dataset, int(year))
 
         # Final success message after all files are processed
         self.stdout.write(self.style.SUCCESS('All CSV data loaded successfully!'))
+
+    def load_areas(self, file_path):
+        """
+        Loads the district and barri names, replacing any names already stored.
+
+        Args:
+            file_path (str): Path to the areas CSV file.
+        """
+        with open(file_path, 'r') as file:
+            barris = [
+                Barri(
+                    code=int(row['Codi_Barri']),
+                    name=row['Nom_Barri'],
+                    district_code=int(row['Codi_Districte']),
+                    district_name=row['Nom_Districte'],
+                )
+                for row in csv.DictReader(file)
+            ]
+
+        with transaction.atomic():
+            Barri.objects.all().delete()
+            Barri.objects.bulk_create(barris)
+
+    def load_partition(self, file_path, dataset, year, batch_size=5000):
+        """
+        Replaces the (dataset, year) partition with the rows of a cleaned CSV file.
+        Every column other than the date, area codes and 'Valor' is stored as a dimension,
+        and the aggregates of the partition are materialised again from the rows that were loaded.
+
+        Args:
+            file_path (str): Path to the cleaned CSV file.
+            dataset (str): Name of the padró dataset the file belongs to.
+            year (int): Year of the partition.
+            batch_size (int): The batch size to control memory usage when inserting records.
+        """
+        with transaction.atomic():
+            # Drop the previous load of this partition so reloading is idempotent
+            PopulationData.objects.filter(dataset=dataset, year=year).delete()
+
+            # List to accumulate records to insert into the database
+            records_to_create = []
+            # Values of every loaded row, so the aggregates match the stored rows
+            loaded_rows = []
+
+            # Open the CSV file for reading
+            with open(file_path, 'r') as file:
+                reader = csv.DictReader(file)
+                fixed_columns = {DATE_COLUMN, 'Codi_Districte', 'Codi_Barri', VALUE_COLUMN}
+                dimension_columns = [column for column in reader.fieldnames if column not in fixed_columns]
+
+                # Process each row in the CSV
+                for row in reader:
+                    try:
+                        # Ensure the required fields are present and valid
+                        if not row[VALUE_COLUMN] or not row[DATE_COLUMN]:
+                            ## Debugging
+                            # self.stdout.write(self.style.WARNING(f'Skipping row with missing data: {row}'))
+                            continue
+
+                        district_code = int(row['Codi_Districte'])
+                        barri_code = int(row['Codi_Barri'])
+                        population_count = int(row[VALUE_COLUMN])  # Map 'Valor' from the CSV to the model's field
+                        codes = [int(row[column]) for column in dimension_columns]
+
+                        # Append the row as a new PopulationData object
+                        records_to_create.append(PopulationData(
+                            dataset=dataset,
+                            year=year,
+                            date=row[DATE_COLUMN],
+                            district_code=district_code,
+                            barri_code=barri_code,
+                            population_count=population_count,
+                            dimensions=dict(zip(dimension_columns, codes)),
+                        ))
+                        loaded_rows.append((row[DATE_COLUMN], district_code, barri_code, population_count, *codes))
+
+                        # Insert records in batches to optimize memory usage
+                        if len(records_to_create) >= batch_size:
+                            PopulationData.objects.bulk_create(records_to_create)
+                            records_to_create = []  # Reset the list after insertion
+
+                    except KeyError as e:
+                        # Handle case where a column is missing in the current row
+                        self.stdout.write(self.style.ERROR(f"Missing column in row: {e}. Row: {row}"))
+                    except Exception as e:
+                        # Handle any other errors
+                        self.stdout.write(self.style.ERROR(f"Error processing row: {e}. Row: {row}"))
+
+            # Insert any remaining records after processing the file
+            if records_to_create:
+                PopulationData.objects.bulk_create(records_to_create)
+
+            loaded = pd.DataFrame(loaded_rows, columns=[DATE_COLUMN, 'Codi_Districte', 'Codi_Barri', VALUE_COLUMN] + dimension_columns)
+            self.load_aggregates(loaded, dataset, year, dimension_columns, batch_size)
+
+    def load_aggregates(self, loaded, dataset, year, dimension_columns, batch_size):
+        """
+        Replaces the materialised aggregates of the (dataset, year) partition.
+
+        Args:
+            loaded (pd.DataFrame): The rows loaded into the partition, laid out as returned by clean_padro_frame.
+            dataset (str): Name of the padró dataset the file belongs to.
+            year (int): Year of the partition.
+            dimension_columns (list): Dimension columns of the file.
+            batch_size (int): The batch size to control memory usage when inserting records.
+        """
+        PopulationAggregate.objects.filter(dataset=dataset, year=year).delete()
+        PopulationAggregate.objects.bulk_create([
+            PopulationAggregate(
+                dataset=dataset,
+                year=year,
+                date=date,
+                district_code=district_code,
+                barri_code=barri_code,
+                dimension=dimension,
+                code=code,
+                population_count=value,
+            )
+            for date, district_code, barri_code, dimension, code, value
+            in aggregate_dimensions(loaded, dimension_columns).itertuples(index=False, name=None)
+        ], batch_size=batch_size)
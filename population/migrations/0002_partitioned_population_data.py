@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('population', '0001_initial'),
+    ]
+
+    # The aggregated nationality rows cannot be mapped onto the per-barri layout,
+    # so the table is recreated and has to be reloaded with the load_data command.
+    operations = [
+        migrations.CreateModel(
+            name='Barri',
+            fields=[
+                ('code', models.IntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('district_code', models.IntegerField()),
+                ('district_name', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.DeleteModel(
+            name='PopulationData',
+        ),
+        migrations.CreateModel(
+            name='PopulationData',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dataset', models.CharField(max_length=100)),
+                ('year', models.IntegerField()),
+                ('date', models.DateField()),
+                ('district_code', models.IntegerField()),
+                ('barri_code', models.IntegerField()),
+                ('population_count', models.IntegerField()),
+                ('dimensions', models.JSONField(default=dict)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dataset', 'year', 'barri_code'], name='population_partition_idx')],
+            },
+        ),
+    ]
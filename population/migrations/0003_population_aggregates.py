@@ -0,0 +1,63 @@
+import pandas as pd
+from django.db import migrations, models
+from population.padro import aggregate_dimensions
+
+
+def build_aggregates(apps, schema_editor):
+    # Materialise the aggregates of the partitions that are already loaded
+    PopulationData = apps.get_model('population', 'PopulationData')
+    PopulationAggregate = apps.get_model('population', 'PopulationAggregate')
+
+    partitions = PopulationData.objects.values_list('dataset', 'year').distinct()
+    for dataset, year in partitions:
+        rows = PopulationData.objects.filter(dataset=dataset, year=year).values_list(
+            'date', 'district_code', 'barri_code', 'population_count', 'dimensions')
+        records = [
+            {'Data_Referencia': date, 'Codi_Districte': district_code, 'Codi_Barri': barri_code, 'Valor': value, **dimensions}
+            for date, district_code, barri_code, value, dimensions in rows.iterator()
+        ]
+        cleaned = pd.DataFrame(records)
+        dims = [column for column in cleaned.columns if column not in ('Data_Referencia', 'Codi_Districte', 'Codi_Barri', 'Valor')]
+        PopulationAggregate.objects.bulk_create([
+            PopulationAggregate(
+                dataset=dataset, year=year, date=date, district_code=district_code, barri_code=barri_code,
+                dimension=dimension, code=code, population_count=value,
+            )
+            for date, district_code, barri_code, dimension, code, value in aggregate_dimensions(cleaned, dims).itertuples(index=False, name=None)
+        ], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('population', '0002_partitioned_population_data'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopulationAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dataset', models.CharField(max_length=100)),
+                ('year', models.IntegerField()),
+                ('date', models.DateField()),
+                ('district_code', models.IntegerField()),
+                ('barri_code', models.IntegerField()),
+                ('dimension', models.CharField(max_length=50)),
+                ('code', models.IntegerField()),
+                ('population_count', models.IntegerField()),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['dataset', 'dimension', 'year'], name='aggregate_dimension_idx'),
+                    models.Index(fields=['dataset', 'dimension', 'district_code', 'year'], name='aggregate_district_idx'),
+                    models.Index(fields=['dataset', 'dimension', 'barri_code', 'year'], name='aggregate_barri_idx'),
+                ],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='populationdata',
+            index=models.Index(fields=['dataset', 'year', 'district_code'], name='population_district_idx'),
+        ),
+        migrations.RunPython(build_aggregates, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,54 @@
 from django.db import models
 
+class Barri(models.Model):
+    code = models.IntegerField(primary_key=True)
+    name = models.CharField(max_length=100)
+    district_code = models.IntegerField()
+    district_name = models.CharField(max_length=100)
+
+    def __str__(self):
+        return f"{self.district_name} - {self.name}"
+
 class PopulationData(models.Model):
+    # Rows are partitioned by (dataset, year): loads replace a whole partition and
+    # every query filters on it first, so wide extracts stay fast to load and read.
+    dataset = models.CharField(max_length=100)
+    year = models.IntegerField()
     date = models.DateField()
+    district_code = models.IntegerField()
+    barri_code = models.IntegerField()
     population_count = models.IntegerField()
-    nationality = models.CharField(max_length=50)
-    
+    # Dimension codes of the row, e.g. {"NACIONALITAT_G": 1, "EDAT_Q": 4, "SEXE": 2}
+    dimensions = models.JSONField(default=dict)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['dataset', 'year', 'barri_code'], name='population_partition_idx'),
+            models.Index(fields=['dataset', 'year', 'district_code'], name='population_district_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.dataset} - {self.date} - {self.barri_code} - {self.population_count} - {self.dimensions} "
+
+class PopulationAggregate(models.Model):
+    # Population summed per (dataset, year, date, barri, dimension, code), materialised whenever
+    # a partition is loaded. Reads sum these rows instead of extracting the JSON of every
+    # PopulationData row, so they scale with areas x codes rather than with the extract size.
+    dataset = models.CharField(max_length=100)
+    year = models.IntegerField()
+    date = models.DateField()
+    district_code = models.IntegerField()
+    barri_code = models.IntegerField()
+    dimension = models.CharField(max_length=50)
+    code = models.IntegerField()
+    population_count = models.IntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['dataset', 'dimension', 'year'], name='aggregate_dimension_idx'),
+            models.Index(fields=['dataset', 'dimension', 'district_code', 'year'], name='aggregate_district_idx'),
+            models.Index(fields=['dataset', 'dimension', 'barri_code', 'year'], name='aggregate_barri_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.date} - {self.population_count} - {self.nationality} "
+        return f"{self.dataset} - {self.date} - {self.barri_code} - {self.dimension}={self.code} - {self.population_count} "
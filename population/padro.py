@@ -0,0 +1,207 @@
+# padro.py
+# Author: Amil Shrivastava
+# Description: Shared helpers for the padró (municipal register) extracts published by the
+# Opendata of Ajuntament of Barcelona. Any extract named '<year>_pad_mdb_<dataset>.csv',
+# '<year>_pad_mdbas_<dataset>.csv' or '<year>_pad_dom_mdbas_<dataset>.csv' is supported: its dimension columns are recognised through the pad_dimensions.csv dictionary.
+
+import logging
+import os
+import re
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Location of the dimension dictionary shipped with the raw data
+DIMENSIONS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'pad_dimensions.csv')
+
+# Extract used by the dashboard when no other dataset is requested
+DEFAULT_DATASET = 'nacionalitat-g_edat-q_sexe'
+
+# Raw extracts are named '<year>_pad_mdb_<dataset>.csv', '<year>_pad_mdbas_<dataset>.csv'
+# (people) or '<year>_pad_dom_mdbas_<dataset>.csv' (households)
+RAW_FILE_PATTERN = re.compile(r'^(?P<year>\d{4})_pad_(?:dom_)?mdb(?:as)?_(?P<dataset>.+)\.csv$')
+
+# Columns present in every extract besides its dimension columns
+DATE_COLUMN = 'Data_Referencia'
+VALUE_COLUMN = 'Valor'
+DISTRICT_COLUMNS = ['Codi_Districte', 'Nom_Districte']
+BARRI_COLUMNS = ['Codi_Barri', 'Nom_Barri']
+
+# Short labels used by the dashboard instead of the dictionary descriptions
+LABEL_OVERRIDES = {
+    'NACIONALITAT_G': {
+        1: 'Local',
+        2: 'EU',
+        3: 'Non-EU',
+        4: 'Unknown'
+    }
+}
+
+_dimensions_cache = {}
+
+def load_dimensions(path=DIMENSIONS_FILE):
+    """
+    Loads the dimension dictionary describing the coded columns of the padró extracts.
+
+    Args:
+        path (str): Path to the pad_dimensions.csv file.
+
+    Returns:
+        dict: Mapping of dimension name to a {code: English label} dictionary.
+    """
+    if path not in _dimensions_cache:
+        df = pd.read_csv(path)
+        dimensions = {}
+        for name, group in df.groupby('Desc_Dimensio'):
+            dimensions[name] = dict(zip(group['Codi_Valor'].astype(int), group['Desc_Valor_EN']))
+        for name, labels in LABEL_OVERRIDES.items():
+            dimensions.setdefault(name, {}).update(labels)
+        _dimensions_cache[path] = dimensions
+    return _dimensions_cache[path]
+
+def parse_raw_file_name(file_name):
+    """
+    Extracts the year and dataset name from a raw padró file name.
+
+    Args:
+        file_name (str): File name such as '2024_pad_mdb_nacionalitat-g_edat-q_sexe.csv' or
+            '2024_pad_mdbas_nacionalitat-g_sexe.csv'.
+
+    Returns:
+        tuple: (year, dataset), or None if the name does not follow the padró convention.
+    """
+    match = RAW_FILE_PATTERN.match(os.path.basename(file_name))
+    if match is None:
+        return None
+    return int(match.group('year')), match.group('dataset')
+
+def dimension_columns(columns, dimensions=None):
+    """
+    Returns the columns of an extract that are described by the dimension dictionary.
+
+    Args:
+        columns (iterable): Column names of the extract.
+        dimensions (dict): Dimension dictionary, loaded with load_dimensions() if omitted.
+
+    Returns:
+        list: The dimension columns, in the order they appear in the extract.
+    """
+    dimensions = load_dimensions() if dimensions is None else dimensions
+    return [column for column in columns if column in dimensions]
+
+def clean_padro_frame(df, dimensions=None):
+    """
+    Cleans a raw padró extract while keeping all of its dimension columns:
+    - Replaces invalid values ('..') in 'Valor' with NaN and drops those rows
+    - Converts the area and dimension codes to integers
+    - Sums duplicated rows so every (date, area, dimensions) combination appears once
+
+    Args:
+        df (pd.DataFrame): Raw extract as read from the CSV file.
+        dimensions (dict): Dimension dictionary, loaded with load_dimensions() if omitted.
+
+    Returns:
+        tuple: (cleaned DataFrame, list of dimension columns).
+    """
+    dims = dimension_columns(df.columns, dimensions)
+    keys = [DATE_COLUMN, 'Codi_Districte', 'Codi_Barri'] + dims
+
+    df = df[keys + [VALUE_COLUMN]].copy()
+
+    # Suppressed counts are published as '..'
+    df[VALUE_COLUMN] = pd.to_numeric(df[VALUE_COLUMN].replace('..', pd.NA), errors='coerce')
+    df = df.dropna()
+
+    for column in keys[1:]:
+        df[column] = df[column].astype(int)
+    df[VALUE_COLUMN] = df[VALUE_COLUMN].astype(int)
+
+    df = df.groupby(keys, as_index=False, sort=False)[VALUE_COLUMN].sum()
+    return df[[DATE_COLUMN, 'Codi_Districte', 'Codi_Barri', VALUE_COLUMN] + dims], dims
+
+def aggregate_dimensions(cleaned, dims):
+    """
+    Sums a cleaned extract per area and value of each dimension. The dashboard and the API
+    read these pre-summed rows instead of aggregating every row of a wide extract.
+
+    Args:
+        cleaned (pd.DataFrame): Extract returned by clean_padro_frame.
+        dims (list): Dimension columns of the extract.
+
+    Returns:
+        pd.DataFrame: One row per (date, district, barri, dimension, code) with the summed 'Valor'.
+    """
+    keys = [DATE_COLUMN, 'Codi_Districte', 'Codi_Barri']
+    frames = []
+    for dimension in dims:
+        df = cleaned.groupby(keys + [dimension], as_index=False, sort=False)[VALUE_COLUMN].sum()
+        df = df.rename(columns={dimension: 'code'})
+        df.insert(len(keys), 'dimension', dimension)
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=keys + ['dimension', 'code', VALUE_COLUMN])
+    return pd.concat(frames, ignore_index=True)
+
+def extract_areas(df):
+    """
+    Extracts the distinct districts and barris named in a raw padró extract.
+
+    Args:
+        df (pd.DataFrame): Raw extract as read from the CSV file.
+
+    Returns:
+        pd.DataFrame: One row per barri with its code, name, district code and district name.
+    """
+    return df[BARRI_COLUMNS + DISTRICT_COLUMNS].drop_duplicates('Codi_Barri').reset_index(drop=True)
+
+def list_raw_files(folder):
+    """
+    Lists the raw padró extracts of a folder. Other CSV files are skipped with a warning,
+    except for the pad_dimensions.csv dictionary.
+
+    Args:
+        folder (str): Folder containing the raw CSV files.
+
+    Returns:
+        list: (file path, year, dataset) tuples sorted by file name.
+    """
+    files = []
+    for file_name in sorted(os.listdir(folder)):
+        parsed = parse_raw_file_name(file_name)
+        if parsed is not None:
+            files.append((os.path.join(folder, file_name), *parsed))
+        elif file_name.endswith('.csv') and file_name != os.path.basename(DIMENSIONS_FILE):
+            logger.warning("Skipping '%s': not named like a padró extract", file_name)
+    return files
+
+def write_cleaned_files(input_folder, output_folder, dimensions=None):
+    """
+    Cleans every raw padró extract of a folder into the layout read by the load_data command:
+    one '<dataset>/<year>.csv' file per partition plus an 'areas.csv' file with the district
+    and barri names shared by all extracts.
+
+    Args:
+        input_folder (str): Folder containing the raw CSV files.
+        output_folder (str): Folder where the cleaned CSV files are saved.
+        dimensions (dict): Dimension dictionary, loaded with load_dimensions() if omitted.
+
+    Returns:
+        list: Paths of the cleaned partition files.
+    """
+    dimensions = load_dimensions() if dimensions is None else dimensions
+    written = []
+    areas = []
+
+    for file_path, year, dataset in list_raw_files(input_folder):
+        df = pd.read_csv(file_path)
+        cleaned, _ = clean_padro_frame(df, dimensions)
+
+        output_path = os.path.join(output_folder, dataset, f"{year}.csv")
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        cleaned.to_csv(output_path, index=False)
+        written.append(output_path)
+        areas.append(extract_areas(df))
+
+    if areas:
+        pd.concat(areas).drop_duplicates('Codi_Barri').sort_values('Codi_Barri').to_csv(os.path.join(output_folder, 'areas.csv'), index=False)
+    return written
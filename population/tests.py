@@ -1,3 +1,306 @@
-from django.test import TestCase
+import multiprocessing
+import os
+import signal
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from backend.downsampling import downsample_series, lttb_indices
+from population.management.commands.ingest import Command as IngestCommand
+from population.models import Barri, PopulationAggregate, PopulationData
+from population.padro import aggregate_dimensions, clean_padro_frame, list_raw_files, parse_raw_file_name, write_cleaned_files
+
+# Seconds after which an ingest run is considered hung
+INGEST_TIMEOUT = 60
+
+AREAS = [
+    (1, 'Ciutat Vella', 1, 'el Raval'),
+    (1, 'Ciutat Vella', 2, 'el Barri Gòtic'),
+    (2, 'Eixample', 7, 'la Dreta de l\'Eixample'),
+]
+
+def write_raw_file(folder, year, rows_per_area=1):
+    """
+    Writes a small raw padró extract with NACIONALITAT_G and SEXE dimensions.
+    The first count of every area is suppressed ('..'), as in the published files.
+    """
+    records = []
+    for district_code, district_name, barri_code, barri_name in AREAS:
+        for nationality in range(1, 5):
+            for sex in (1, 2):
+                for _ in range(rows_per_area):
+                    value = '..' if (nationality, sex) == (1, 1) else str(10 * nationality + sex)
+                    records.append((f'{year}-01-01', district_code, district_name, barri_code, barri_name, value, nationality, sex))
+    df = pd.DataFrame(records, columns=[
+        'Data_Referencia', 'Codi_Districte', 'Nom_Districte', 'Codi_Barri', 'Nom_Barri', 'Valor', 'NACIONALITAT_G', 'SEXE',
+    ])
+    path = os.path.join(folder, f'{year}_pad_mdb_nacionalitat-g_sexe.csv')
+    df.to_csv(path, index=False)
+    return path
+
+def ingest(folder, **options):
+    """
+    Runs the ingest command, failing instead of blocking forever if it hangs.
+    """
+    def timeout(signum, frame):
+        raise TimeoutError(f'ingest did not finish within {INGEST_TIMEOUT} seconds')
+
+    previous = signal.signal(signal.SIGALRM, timeout)
+    signal.alarm(INGEST_TIMEOUT)
+    try:
+        call_command('ingest', folder, stdout=StringIO(), **options)
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, previous)
+
+class PadroTests(SimpleTestCase):
+    def test_parse_raw_file_name(self):
+        self.assertEqual(parse_raw_file_name('2024_pad_mdb_nacionalitat-g_edat-q_sexe.csv'), (2024, 'nacionalitat-g_edat-q_sexe'))
+        self.assertEqual(parse_raw_file_name('2024_pad_mdbas_nacionalitat-g_sexe.csv'), (2024, 'nacionalitat-g_sexe'))
+        self.assertEqual(parse_raw_file_name('2024_pad_dom_mdbas_n-persones.csv'), (2024, 'n-persones'))
+        self.assertIsNone(parse_raw_file_name('pad_dimensions.csv'))
+
+    def test_clean_padro_frame_drops_suppressed_values(self):
+        with tempfile.TemporaryDirectory() as folder:
+            raw = pd.read_csv(write_raw_file(folder, 2024, rows_per_area=2))
+
+        cleaned, dims = clean_padro_frame(raw)
+
+        self.assertEqual(dims, ['NACIONALITAT_G', 'SEXE'])
+        self.assertEqual(len(cleaned), 3 * 7)
+        self.assertFalse(((cleaned['NACIONALITAT_G'] == 1) & (cleaned['SEXE'] == 1)).any())
+        # Duplicated rows are summed
+        row = cleaned[(cleaned['Codi_Barri'] == 2) & (cleaned['NACIONALITAT_G'] == 4) & (cleaned['SEXE'] == 2)]
+        self.assertEqual(row['Valor'].tolist(), [2 * 42])
+
+    def test_aggregate_dimensions_totals(self):
+        with tempfile.TemporaryDirectory() as folder:
+            cleaned, dims = clean_padro_frame(pd.read_csv(write_raw_file(folder, 2024)))
+
+        aggregates = aggregate_dimensions(cleaned, dims)
+
+        for dimension in dims:
+            self.assertEqual(aggregates.loc[aggregates['dimension'] == dimension, 'Valor'].sum(), cleaned['Valor'].sum())
+        sexes = aggregates[(aggregates['dimension'] == 'SEXE') & (aggregates['Codi_Barri'] == 1)]
+        self.assertEqual(dict(zip(sexes['code'], sexes['Valor'])), {1: 21 + 31 + 41, 2: 12 + 22 + 32 + 42})
+
+    def test_list_raw_files_warns_about_skipped_csv_files(self):
+        with tempfile.TemporaryDirectory() as folder:
+            for name in ('2024_pad_mdbas_nacionalitat-g_sexe.csv', 'pad_dimensions.csv', 'notes.csv'):
+                open(os.path.join(folder, name), 'w').close()
+
+            with self.assertLogs('population.padro', level='WARNING') as logs:
+                files = list_raw_files(folder)
+
+        self.assertEqual([(year, dataset) for _, year, dataset in files], [(2024, 'nacionalitat-g_sexe')])
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('notes.csv', logs.output[0])
+
+class LoadDataCommandTests(TestCase):
+    def setUp(self):
+        self.raw_folder = tempfile.TemporaryDirectory()
+        self.cleaned_folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.raw_folder.cleanup)
+        self.addCleanup(self.cleaned_folder.cleanup)
+
+    def load(self):
+        write_cleaned_files(self.raw_folder.name, self.cleaned_folder.name)
+        call_command('load_data', self.cleaned_folder.name, stdout=StringIO())
+
+    def test_load_drops_suppressed_values(self):
+        write_raw_file(self.raw_folder.name, 2024)
+
+        self.load()
+
+        self.assertEqual(PopulationData.objects.count(), 3 * 7)
+        self.assertFalse(PopulationData.objects.filter(dimensions={'NACIONALITAT_G': 1, 'SEXE': 1}).exists())
+        self.assertEqual(Barri.objects.count(), 3)
+
+    def test_reload_replaces_partition(self):
+        write_raw_file(self.raw_folder.name, 2024)
+        self.load()
+        write_raw_file(self.raw_folder.name, 2024, rows_per_area=2)
+        self.load()
+
+        self.assertEqual(PopulationData.objects.count(), 3 * 7)
+        self.assertEqual(PopulationData.objects.get(barri_code=1, dimensions={'NACIONALITAT_G': 2, 'SEXE': 1}).population_count, 2 * 21)
+        self.assertEqual(PopulationAggregate.objects.get(barri_code=1, dimension='NACIONALITAT_G', code=2).population_count, 2 * (21 + 22))
+
+    def test_aggregates_match_loaded_rows(self):
+        write_raw_file(self.raw_folder.name, 2024)
+        write_cleaned_files(self.raw_folder.name, self.cleaned_folder.name)
+        # A row the command cannot parse is skipped for both tables
+        with open(os.path.join(self.cleaned_folder.name, 'nacionalitat-g_sexe', '2024.csv'), 'a') as f:
+            f.write('2024-01-01,1,1,1000,x,1\n')
+
+        call_command('load_data', self.cleaned_folder.name, stdout=StringIO())
+
+        rows_total = sum(PopulationData.objects.values_list('population_count', flat=True))
+        for dimension in ('NACIONALITAT_G', 'SEXE'):
+            aggregates = PopulationAggregate.objects.filter(dimension=dimension)
+            self.assertEqual(sum(aggregates.values_list('population_count', flat=True)), rows_total)
+
+class IngestCommandTests(TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def test_ingest_loads_rows_aggregates_and_areas(self):
+        write_raw_file(self.folder.name, 2023)
+        write_raw_file(self.folder.name, 2024)
+
+        ingest(self.folder.name, workers=2, batch_size=5)
+
+        # 8 combinations per area, one of them suppressed
+        self.assertEqual(PopulationData.objects.filter(dataset='nacionalitat-g_sexe').count(), 2 * 3 * 7)
+        self.assertEqual(Barri.objects.count(), 3)
+        row = PopulationData.objects.get(year=2024, barri_code=7, dimensions={'NACIONALITAT_G': 3, 'SEXE': 2})
+        self.assertEqual(row.population_count, 32)
+
+        aggregate = PopulationAggregate.objects.get(year=2024, barri_code=7, dimension='NACIONALITAT_G', code=1)
+        self.assertEqual(aggregate.population_count, 12)
+        for dimension in ('NACIONALITAT_G', 'SEXE'):
+            total = sum(PopulationAggregate.objects.filter(year=2024, dimension=dimension).values_list('population_count', flat=True))
+            self.assertEqual(total, sum(PopulationData.objects.filter(year=2024).values_list('population_count', flat=True)))
+
+    def test_ingest_with_spawned_workers(self):
+        # Spawned workers re-import the worker module without Django being set up, as on macOS,
+        # Windows and, from Python 3.14, Linux
+        start_method = multiprocessing.get_start_method()
+        multiprocessing.set_start_method('spawn', force=True)
+        self.addCleanup(multiprocessing.set_start_method, start_method, force=True)
+        write_raw_file(self.folder.name, 2023)
+        write_raw_file(self.folder.name, 2024)
+
+        ingest(self.folder.name, workers=2)
+
+        self.assertEqual(PopulationData.objects.count(), 2 * 3 * 7)
+
+    def test_reingest_replaces_partition(self):
+        write_raw_file(self.folder.name, 2024)
+
+        ingest(self.folder.name)
+        ingest(self.folder.name)
+
+        self.assertEqual(PopulationData.objects.count(), 3 * 7)
+        self.assertEqual(PopulationAggregate.objects.filter(dimension='SEXE').count(), 3 * 2)
+
+    def test_failed_file_rolls_back_and_raises(self):
+        write_raw_file(self.folder.name, 2024)
+        ingest(self.folder.name)
+
+        write_raw_file(self.folder.name, 2024, rows_per_area=2)
+        with open(os.path.join(self.folder.name, '2025_pad_mdb_nacionalitat-g_sexe.csv'), 'w') as f:
+            f.write('a,b\n1,2\n')
+
+        with self.assertRaises(CommandError):
+            ingest(self.folder.name)
+
+        # The 2024 partition keeps the counts of the first run
+        self.assertEqual(PopulationData.objects.count(), 3 * 7)
+        self.assertEqual(PopulationData.objects.get(barri_code=1, dimensions={'NACIONALITAT_G': 2, 'SEXE': 1}).population_count, 21)
+
+    def test_writer_failure_stops_workers(self):
+        for year in range(2020, 2025):
+            write_raw_file(self.folder.name, year, rows_per_area=5)
+
+        # Many small batches on a one-slot queue leave the workers blocked when the writer fails
+        with mock.patch.object(IngestCommand, 'insert_sql', return_value='INSERT INTO missing_table VALUES (%s)'):
+            with self.assertRaises(Exception) as raised:
+                ingest(self.folder.name, workers=2, batch_size=1, queue_size=1)
+
+        self.assertNotIsInstance(raised.exception, TimeoutError)
+        self.assertEqual(PopulationData.objects.count(), 0)
+
+class PopulationApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # 10 people per (year, area, nationality), plus the year so every year sums differently
+        PopulationAggregate.objects.bulk_create([
+            PopulationAggregate(
+                dataset='nacionalitat-g_sexe', year=year, date=f'{year}-01-01', district_code=district_code,
+                barri_code=barri_code, dimension='NACIONALITAT_G', code=code, population_count=10 + year - 2022,
+            )
+            for year in (2022, 2023, 2024)
+            for district_code, _, barri_code, _ in AREAS
+            for code in (1, 2)
+        ])
+
+    def get(self, **params):
+        return self.client.get(reverse('population-series'), {'dataset': 'nacionalitat-g_sexe', **params})
+
+    def test_bad_integer_returns_400(self):
+        response = self.get(dimension='NACIONALITAT_G', district='one')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Invalid parameter', response.json()['error'])
+
+    def test_unknown_dimension_returns_400(self):
+        response = self.get(dimension='EDAT_Q')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Unknown dimension', response.json()['error'])
+
+    def test_city_series(self):
+        series = self.get(dimension='NACIONALITAT_G').json()['series']
+
+        self.assertEqual(len(series), 3 * 2)
+        self.assertEqual(series[0], {'date': '2022-01-01', 'population_count': 30, 'category': 'Local'})
+
+    def test_area_filters(self):
+        district = self.get(dimension='NACIONALITAT_G', district=1).json()['series']
+        barri = self.get(dimension='NACIONALITAT_G', barri=7).json()['series']
+
+        self.assertEqual([row['population_count'] for row in district if row['date'] == '2022-01-01'], [20, 20])
+        self.assertEqual([row['population_count'] for row in barri if row['date'] == '2024-01-01'], [12, 12])
+
+    def test_year_range_filter(self):
+        both = self.get(dimension='NACIONALITAT_G', start_year=2023, end_year=2023).json()['series']
+        start = self.get(dimension='NACIONALITAT_G', start_year=2023).json()['series']
+        end = self.get(dimension='NACIONALITAT_G', end_year=2022).json()['series']
+
+        self.assertEqual({row['date'] for row in both}, {'2023-01-01'})
+        self.assertEqual({row['date'] for row in start}, {'2023-01-01', '2024-01-01'})
+        self.assertEqual({row['date'] for row in end}, {'2022-01-01'})
+
+class DownsamplingTests(SimpleTestCase):
+    def test_lttb_keeps_endpoints_and_threshold(self):
+        x = np.arange(1000)
+        y = np.sin(x / 50)
+
+        indices = lttb_indices(x, y, 100)
+
+        self.assertEqual(len(indices), 100)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], 999)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+
+    def test_lttb_keeps_peaks(self):
+        y = np.zeros(1000)
+        y[437] = 100
+
+        self.assertIn(437, lttb_indices(np.arange(1000), y, 20))
+
+    def test_lttb_keeps_short_series(self):
+        np.testing.assert_array_equal(lttb_indices(np.arange(10), np.arange(10), 20), np.arange(10))
+
+    def test_downsample_series_fits_chart_width(self):
+        df = pd.DataFrame({
+            'date': pd.date_range('2000-01-01', periods=5000, freq='D'),
+            'population_count': np.arange(5000),
+        })
+
+        downsampled = downsample_series(df, width_px=200)
+
+        self.assertEqual(len(downsampled), 200)
+        self.assertEqual(downsampled['date'].iloc[0], df['date'].iloc[0])
+        self.assertEqual(downsampled['date'].iloc[-1], df['date'].iloc[-1])
+        short = df.head(50)
+        self.assertIs(downsample_series(short, width_px=200), short)
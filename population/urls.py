@@ -0,0 +1,6 @@
+from django.urls import path
+from population import views
+
+urlpatterns = [
+    path('population/', views.population_series, name='population-series'),
+]
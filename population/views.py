@@ -1,3 +1,39 @@
-from django.shortcuts import render
+from django.http import JsonResponse
+from backend.backend import load_population_data
+from population.models import PopulationAggregate
+from population.padro import DEFAULT_DATASET
 
-# Create your views here.
+def _int_param(request, name):
+    value = request.GET.get(name)
+    return int(value) if value not in (None, '') else None
+
+def population_series(request):
+    """
+    Returns the population per date and dimension value as JSON.
+
+    Query parameters: dataset, dimension (default 'NACIONALITAT_G'), district, barri,
+    start_year and end_year. The area and year parameters are optional filters.
+    """
+    dataset = request.GET.get('dataset', DEFAULT_DATASET)
+    dimension = request.GET.get('dimension', 'NACIONALITAT_G')
+    try:
+        district_code = _int_param(request, 'district')
+        barri_code = _int_param(request, 'barri')
+        start_year = _int_param(request, 'start_year')
+        end_year = _int_param(request, 'end_year')
+    except ValueError as e:
+        return JsonResponse({'error': f'Invalid parameter: {e}'}, status=400)
+
+    if not PopulationAggregate.objects.filter(dataset=dataset, dimension=dimension).exists():
+        return JsonResponse({'error': f"Unknown dimension '{dimension}' for dataset '{dataset}'"}, status=400)
+
+    df = load_population_data(
+        dataset, dimension, start_year=start_year, end_year=end_year, district_code=district_code, barri_code=barri_code
+    )
+    df['date'] = df['date'].dt.strftime('%Y-%m-%d')
+
+    return JsonResponse({
+        'dataset': dataset,
+        'dimension': dimension,
+        'series': df.to_dict(orient='records'),
+    })
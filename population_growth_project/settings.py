@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -77,7 +78,8 @@ WSGI_APPLICATION = 'population_growth_project.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        # POPULATION_DB_PATH points the project at another database, e.g. a load-test fixture
+        'NAME': os.environ.get('POPULATION_DB_PATH', BASE_DIR / 'db.sqlite3'),
     }
 }
 
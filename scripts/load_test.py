@@ -0,0 +1,362 @@
+# load_test.py
+# Author: Amil Shrivastava
+# Description: This script load-tests the dashboard and API stack on the local machine.
+# It builds a fixture database from the raw CSV files, starts the Django backend and the Streamlit app
+# against it, then simulates concurrent dashboard sessions and API clients at increasing concurrency levels.
+# For each level it reports throughput, p50/p95/p99 latency and error rates, and the level where the stack saturates.
+#
+# Usage: python scripts/load_test.py --levels 1,2,4,8,16 --duration 20
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from urllib.parse import urlencode
+
+import pandas as pd
+from websockets.sync.client import connect
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+# The management commands and the servers are run from the project root
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+RAW_DATA_FOLDER = os.path.join(project_root, 'data')
+STARTUP_TIMEOUT = 120  # Seconds to wait for the servers to accept requests
+REQUEST_TIMEOUT = 30  # Seconds before a single request or session counts as failed
+
+def build_fixture_database(folder):
+    """
+    Builds a fixture database from the raw CSV files in the data folder, with the same
+    ingest command the Docker image runs.
+
+    Args:
+        folder (str): Working folder for the database.
+
+    Returns:
+        str: Path to the fixture SQLite database.
+    """
+    db_path = os.path.join(folder, 'fixture.sqlite3')
+    env = dict(os.environ, POPULATION_DB_PATH=db_path)
+    manage = [sys.executable, os.path.join(project_root, 'manage.py')]
+    subprocess.run(manage + ['migrate', '-v', '0'], check=True, env=env, cwd=project_root)
+    subprocess.run(manage + ['ingest', RAW_DATA_FOLDER], check=True, env=env, cwd=project_root, stdout=subprocess.DEVNULL)
+    return db_path
+
+def fetch_barri_codes(db_path):
+    """
+    Reads the district and barri codes of the fixture database.
+
+    Args:
+        db_path (str): Path to the fixture database.
+
+    Returns:
+        list: (district_code, barri_code) pairs.
+    """
+    with sqlite3.connect(db_path) as connection:
+        return connection.execute('SELECT district_code, code FROM population_barri').fetchall()
+
+def fetch_dimensions(db_path):
+    """
+    Reads the datasets and dimensions loaded in the fixture database.
+
+    Args:
+        db_path (str): Path to the fixture database.
+
+    Returns:
+        list: (dataset, dimension) pairs.
+    """
+    with sqlite3.connect(db_path) as connection:
+        return connection.execute('SELECT DISTINCT dataset, dimension FROM population_populationaggregate').fetchall()
+
+def wait_until_up(url, process):
+    """
+    Polls a URL until it answers, failing early if the server process exits.
+
+    Args:
+        url (str): URL to poll.
+        process (subprocess.Popen): The server process.
+    """
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with code {process.returncode} before answering {url}')
+        try:
+            with urllib.request.urlopen(url, timeout=5):
+                return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f'Timed out waiting for {url}')
+
+def start_stack(db_path, api_port, app_port):
+    """
+    Starts the Django backend and the Streamlit app against the fixture database.
+
+    Args:
+        db_path (str): Path to the fixture database.
+        api_port (int): Port for the Django development server.
+        app_port (int): Port for the Streamlit app.
+
+    Returns:
+        list: The started server processes.
+    """
+    env = dict(os.environ, POPULATION_DB_PATH=db_path)
+    api = subprocess.Popen(
+        [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{api_port}'],
+        cwd=project_root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    app = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', 'frontend/app.py', '--server.headless', 'true',
+         '--server.address', '127.0.0.1', '--server.port', str(app_port), '--browser.gatherUsageStats', 'false'],
+        cwd=project_root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    processes = [api, app]
+    try:
+        wait_until_up(f'http://127.0.0.1:{api_port}/api/population/', api)
+        wait_until_up(f'http://127.0.0.1:{app_port}/_stcore/health', app)
+    except Exception:
+        stop_stack(processes)
+        raise
+    return processes
+
+def stop_stack(processes):
+    """
+    Stops the server processes.
+
+    Args:
+        processes (list): Processes returned by start_stack.
+    """
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def random_api_query(barri_codes, dimensions):
+    """
+    Builds the query parameters of a random API request, mixing city, district and barri level queries.
+
+    Args:
+        barri_codes (list): (district_code, barri_code) pairs of the fixture database.
+        dimensions (list): (dataset, dimension) pairs of the fixture database.
+
+    Returns:
+        dict: Query parameters for the population API.
+    """
+    dataset, dimension = random.choice(dimensions)
+    query = {'dataset': dataset, 'dimension': dimension}
+    district_code, barri_code = random.choice(barri_codes)
+    level = random.random()
+    if level < 0.3:
+        query['district'] = district_code
+    elif level < 0.6:
+        query['barri'] = barri_code
+    return query
+
+def run_api_request(base_url, barri_codes, dimensions):
+    """
+    Simulates one API client request.
+
+    Args:
+        base_url (str): Base URL of the Django backend.
+        barri_codes (list): (district_code, barri_code) pairs used to vary the queries.
+        dimensions (list): (dataset, dimension) pairs used to vary the queries.
+    """
+    url = f'{base_url}/api/population/?{urlencode(random_api_query(barri_codes, dimensions))}'
+    with urllib.request.urlopen(url, timeout=REQUEST_TIMEOUT) as response:
+        json.loads(response.read())
+
+def run_dashboard_session(base_url):
+    """
+    Simulates one dashboard session: loads the page, opens the app websocket like a browser,
+    requests a script run and waits until the dashboard has been fully rendered.
+
+    Args:
+        base_url (str): Base URL of the Streamlit app.
+    """
+    with urllib.request.urlopen(f'{base_url}/', timeout=REQUEST_TIMEOUT) as response:
+        response.read()
+
+    ws_url = base_url.replace('http://', 'ws://', 1) + '/_stcore/stream'
+    with connect(ws_url, subprotocols=['streamlit'], open_timeout=REQUEST_TIMEOUT, max_size=None) as websocket:
+        back_msg = BackMsg()
+        back_msg.rerun_script.query_string = ''
+        back_msg.rerun_script.page_script_hash = ''
+        websocket.send(back_msg.SerializeToString())
+
+        deadline = time.time() + REQUEST_TIMEOUT
+        while True:
+            forward_msg = ForwardMsg()
+            forward_msg.ParseFromString(websocket.recv(timeout=max(deadline - time.time(), 0)))
+            if forward_msg.WhichOneof('type') == 'script_finished':
+                if forward_msg.script_finished != ForwardMsg.FINISHED_SUCCESSFULLY:
+                    raise RuntimeError(f'Script finished with status {forward_msg.script_finished}')
+                return
+            if forward_msg.WhichOneof('type') == 'delta' and forward_msg.delta.new_element.WhichOneof('type') == 'exception':
+                raise RuntimeError(forward_msg.delta.new_element.exception.message)
+
+def run_level(concurrency, duration, dashboard_share, api_url, app_url, barri_codes, dimensions):
+    """
+    Runs the given number of concurrent simulated users for a fixed duration.
+    Each user repeatedly runs a dashboard session or an API request, picked at random.
+
+    Args:
+        concurrency (int): Number of concurrent simulated users.
+        duration (float): Duration of the level in seconds.
+        dashboard_share (float): Fraction of operations that are dashboard sessions.
+        api_url (str): Base URL of the Django backend.
+        app_url (str): Base URL of the Streamlit app.
+        barri_codes (list): (district_code, barri_code) pairs used to vary the API queries.
+        dimensions (list): (dataset, dimension) pairs used to vary the API queries.
+
+    Returns:
+        pd.DataFrame: One row per operation with 'kind', 'latency_ms' and 'ok' columns.
+    """
+    results = []
+    lock = threading.Lock()
+    deadline = time.time() + duration
+
+    def user():
+        while time.time() < deadline:
+            kind = 'dashboard' if random.random() < dashboard_share else 'api'
+            start = time.perf_counter()
+            try:
+                if kind == 'dashboard':
+                    run_dashboard_session(app_url)
+                else:
+                    run_api_request(api_url, barri_codes, dimensions)
+                ok = True
+            except Exception:
+                ok = False
+            latency_ms = (time.perf_counter() - start) * 1000
+            with lock:
+                results.append((kind, latency_ms, ok))
+
+    threads = [threading.Thread(target=user, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return pd.DataFrame(results, columns=['kind', 'latency_ms', 'ok'])
+
+def summarize(results, concurrency, duration):
+    """
+    Computes throughput, latency percentiles and error rate for each kind of operation.
+
+    Args:
+        results (pd.DataFrame): Operations recorded by run_level.
+        concurrency (int): Concurrency level of the run.
+        duration (float): Duration of the level in seconds.
+
+    Returns:
+        list: One summary dictionary per kind, plus one for all operations.
+    """
+    rows = []
+    groups = [(kind, group) for kind, group in results.groupby('kind')] + [('all', results)]
+    for kind, group in groups:
+        succeeded = group[group['ok']]['latency_ms']
+        rows.append({
+            'concurrency': concurrency,
+            'kind': kind,
+            'requests': len(group),
+            'throughput_rps': round(len(succeeded) / duration, 2),
+            'p50_ms': round(succeeded.quantile(0.50), 1) if len(succeeded) else None,
+            'p95_ms': round(succeeded.quantile(0.95), 1) if len(succeeded) else None,
+            'p99_ms': round(succeeded.quantile(0.99), 1) if len(succeeded) else None,
+            'error_rate': round(1 - group['ok'].mean(), 4) if len(group) else 0.0,
+        })
+    return rows
+
+def find_saturation(summary, max_p95_ms, max_error_rate, min_gain=0.1):
+    """
+    Finds the concurrency level at which the stack saturates: the first level where the
+    error rate or p95 latency exceeds its limit, or where throughput grows by less than
+    min_gain over the best level so far.
+
+    Args:
+        summary (pd.DataFrame): Summary rows of all levels.
+        max_p95_ms (float): Highest acceptable p95 latency in milliseconds.
+        max_error_rate (float): Highest acceptable error rate.
+        min_gain (float): Minimum relative throughput gain expected from a higher level.
+
+    Returns:
+        tuple: (saturation level or None, reason).
+    """
+    overall = summary[summary['kind'] == 'all'].sort_values('concurrency')
+    best_throughput = 0.0
+    for row in overall.itertuples():
+        if row.error_rate > max_error_rate:
+            return row.concurrency, f'error rate {row.error_rate:.2%} above {max_error_rate:.2%}'
+        if row.p95_ms is not None and row.p95_ms > max_p95_ms:
+            return row.concurrency, f'p95 latency {row.p95_ms:.0f} ms above {max_p95_ms:.0f} ms'
+        if best_throughput and row.throughput_rps < best_throughput * (1 + min_gain):
+            return row.concurrency, f'throughput {row.throughput_rps} rps did not grow over {best_throughput} rps'
+        best_throughput = max(best_throughput, row.throughput_rps)
+    return None, 'not reached'
+
+def main():
+    """
+    Parses the command line, starts the stack and sweeps the concurrency levels.
+    """
+    parser = argparse.ArgumentParser(description='Load-test the Streamlit dashboard and the Django API on a fixture database.')
+    parser.add_argument('--levels', default='1,2,4,8,16,32', help='Comma-separated concurrency levels to sweep.')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds to run each concurrency level.')
+    parser.add_argument('--dashboard-share', type=float, default=0.2, help='Fraction of operations that are dashboard sessions.')
+    parser.add_argument('--api-port', type=int, default=8765, help='Port for the Django backend.')
+    parser.add_argument('--app-port', type=int, default=8599, help='Port for the Streamlit app.')
+    parser.add_argument('--db', help='Existing fixture database to reuse instead of building one.')
+    parser.add_argument('--max-p95-ms', type=float, default=2000, help='p95 latency above which the stack counts as saturated.')
+    parser.add_argument('--max-error-rate', type=float, default=0.01, help='Error rate above which the stack counts as saturated.')
+    parser.add_argument('--output', help='Optional path to save the results as JSON.')
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(',')]
+
+    with tempfile.TemporaryDirectory() as folder:
+        db_path = os.path.abspath(args.db) if args.db else build_fixture_database(folder)
+        processes = start_stack(db_path, args.api_port, args.app_port)
+        try:
+            api_url = f'http://127.0.0.1:{args.api_port}'
+            app_url = f'http://127.0.0.1:{args.app_port}'
+            barri_codes = fetch_barri_codes(db_path)
+            dimensions = fetch_dimensions(db_path)
+
+            # Warm up the caches so the first level does not measure the cold start
+            run_dashboard_session(app_url)
+
+            rows = []
+            for concurrency in levels:
+                results = run_level(concurrency, args.duration, args.dashboard_share, api_url, app_url, barri_codes, dimensions)
+                level_rows = summarize(results, concurrency, args.duration)
+                rows.extend(level_rows)
+                overall = level_rows[-1]
+                print(f"concurrency {concurrency:>4}: {overall['throughput_rps']:>8} rps  "
+                      f"p50 {overall['p50_ms']} ms  p95 {overall['p95_ms']} ms  p99 {overall['p99_ms']} ms  "
+                      f"errors {overall['error_rate']:.2%}")
+        finally:
+            stop_stack(processes)
+
+    summary = pd.DataFrame(rows)
+    print()
+    print(summary.to_string(index=False))
+
+    level, reason = find_saturation(summary, args.max_p95_ms, args.max_error_rate)
+    print()
+    print(f'Saturation point: concurrency {level} ({reason})' if level else 'Saturation point: not reached at the tested levels')
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'levels': rows, 'saturation': {'concurrency': level, 'reason': reason}}, file, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -7,53 +7,81 @@ from sklearn.linear_model import LinearRegression
 import numpy as np
 import pandas as pd
 
-def predict_population(df, years_ahead=3):
+def fit_population_model(df):
     """
-    Predicts future population counts based on historical data using linear regression.
-    
-    The function groups the data by year, applies linear regression to model the population growth trend, 
-    and predicts the population count for the specified number of future years.
-    
+    Fits a linear regression model of the yearly population counts.
+
     Args:
         df (pd.DataFrame): DataFrame containing historical data with a 'date' and 'population_count' column.
-        years_ahead (int): Number of years ahead to predict. Default is 3 years.
-        
+
     Returns:
-        pd.DataFrame: DataFrame containing predicted population counts for the future years.
+        tuple: (fitted LinearRegression model, latest year in the data).
     """
     
-    # Ensure the 'date' column is in datetime format, if it's not already
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    
-    # Extract the year from the 'date' column for aggregation
-    df['year'] = df['date'].dt.year
+    # Extract the year from the 'date' column for aggregation, parsing the dates if needed
+    dates = pd.to_datetime(df['date'], errors='coerce')
+    valid = dates.notna().to_numpy()
+    years = dates.dt.year.to_numpy()[valid].astype(int)
+    counts = df['population_count'].to_numpy(dtype=float)[valid]
     
-    # Group the data by year and calculate the total population count for each year
-    df_grouped = df.groupby('year').agg({'population_count': 'sum'}).reset_index()
+    # Group the data by year and calculate the total population count for each year.
+    # NumPy arrays keep this cheap enough to refit a series on every dashboard interaction.
+    unique_years, positions = np.unique(years, return_inverse=True)
+    yearly_counts = np.bincount(positions, weights=counts)
     
     # Prepare the feature (X) and target (y) variables for the linear regression model
-    X = df_grouped[['year']] # Years as the feature variable
-    y = df_grouped['population_count']     # Population counts as the target variable
+    X = unique_years.reshape(-1, 1) # Years as the feature variable
+    y = yearly_counts               # Population counts as the target variable
     
     # Initialize and train the linear regression model
     model = LinearRegression()
     model.fit(X, y)
-    
-    # Generate a DataFrame for the future years based on the latest year in the dataset
-    future_years = pd.DataFrame({
-        'year': list(range(df_grouped['year'].max() + 1, df_grouped['year'].max() + 1 + years_ahead))
-    })
+
+    return model, int(unique_years.max())
+
+def predict_from_model(model, last_year, years_ahead=3):
+    """
+    Predicts the population for the years following last_year with a fitted model.
+    Fitting once and predicting for several horizons avoids refitting the same history.
+
+    Args:
+        model (LinearRegression): Model returned by fit_population_model.
+        last_year (int): Latest year of the data the model was fitted on.
+        years_ahead (int): Number of years ahead to predict. Default is 3 years.
+
+    Returns:
+        pd.DataFrame: DataFrame containing predicted population counts for the future years.
+    """
+    # Generate the future years based on the latest year in the dataset
+    future_years = np.arange(last_year + 1, last_year + 1 + years_ahead)
     
     ## debugging
-    # print(f"Predicting population for the following future years: {future_years['year'].values}")
+    # print(f"Predicting population for the following future years: {future_years}")
     
     # Predict the population for the future years using the trained model
-    predicted_population = model.predict(future_years[['year']])
+    predicted_population = model.predict(future_years.reshape(-1, 1))
     
     # Combine the predicted population with the corresponding future years into a DataFrame
     future_df = pd.DataFrame({
-        'date': pd.to_datetime(future_years['year'], format='%Y'),  # Convert 'year' to datetime format
+        'date': pd.to_datetime(future_years.astype(str), format='%Y'),  # Convert 'year' to datetime format
         'population_count': predicted_population
     })
     
     return future_df
+
+def predict_population(df, years_ahead=3):
+    """
+    Predicts future population counts based on historical data using linear regression.
+    
+    The function groups the data by year, applies linear regression to model the population growth trend, 
+    and predicts the population count for the specified number of future years.
+    
+    Args:
+        df (pd.DataFrame): DataFrame containing historical data with a 'date' and 'population_count' column.
+        years_ahead (int): Number of years ahead to predict. Default is 3 years.
+        
+    Returns:
+        pd.DataFrame: DataFrame containing predicted population counts for the future years.
+    """
+    model, last_year = fit_population_model(df)
+    return predict_from_model(model, last_year, years_ahead)